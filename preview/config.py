@@ -2,56 +2,59 @@
 
 from os import environ
 
+_env = dict(environ)
+"""Snapshot of the process environment, read once per load of this module."""
+
 APP_VERSION = "0.1rc1"
 
-NAMESPACE = environ.get('NAMESPACE')
+NAMESPACE = _env.get('NAMESPACE')
 """Namespace in which this service is deployed; to qualify keys for secrets."""
 
-DEBUG = environ.get('DEBUG') == '1'
+DEBUG = _env.get('DEBUG') == '1'
 """enable/disable debug mode"""
 
-SERVER_NAME = environ.get('SERVER_NAME', None)
+SERVER_NAME = _env.get('SERVER_NAME', None)
 
-APPLICATION_ROOT = environ.get('APPLICATION_ROOT', '/')
+APPLICATION_ROOT = _env.get('APPLICATION_ROOT', '/')
 
-JWT_SECRET = environ.get('JWT_SECRET', 'foosecret')
+JWT_SECRET = _env.get('JWT_SECRET', 'foosecret')
 """Secret key for auth tokens."""
 
 NS_AFFIX = '' if NAMESPACE == 'production' else f'-{NAMESPACE}'
 
-S3_BUCKET = environ.get('S3_BUCKET', f'preview-submission{NS_AFFIX}')
-S3_VERIFY = bool(int(environ.get('S3_VERIFY', '1')))
-S3_ENDPOINT = environ.get('S3_ENDPOINT', None)
-AWS_REGION = environ.get('AWS_REGION', 'us-east-1')
-AWS_ACCESS_KEY_ID = environ.get('AWS_ACCESS_KEY_ID', 'fookey')
-AWS_SECRET_ACCESS_KEY = environ.get('AWS_SECRET_ACCESS_KEY', 'foosecret')
+S3_BUCKET = _env.get('S3_BUCKET', f'preview-submission{NS_AFFIX}')
+S3_VERIFY = bool(int(_env.get('S3_VERIFY', '1')))
+S3_ENDPOINT = _env.get('S3_ENDPOINT', None)
+AWS_REGION = _env.get('AWS_REGION', 'us-east-1')
+AWS_ACCESS_KEY_ID = _env.get('AWS_ACCESS_KEY_ID', 'fookey')
+AWS_SECRET_ACCESS_KEY = _env.get('AWS_SECRET_ACCESS_KEY', 'foosecret')
 
 MAX_PAYLOAD_SIZE_BYTES = 100 * 1_028
 
-WAIT_FOR_SERVICES = bool(int(environ.get('WAIT_FOR_SERVICES', '1')))
+WAIT_FOR_SERVICES = bool(int(_env.get('WAIT_FOR_SERVICES', '1')))
 """Whether or not to wait for upstream services before starting."""
 
 # --- VAULT INTEGRATION CONFIGURATION ---
 
-VAULT_ENABLED = bool(int(environ.get('VAULT_ENABLED', '0')))
+VAULT_ENABLED = bool(int(_env.get('VAULT_ENABLED', '0')))
 """Enable/disable secret retrieval from Vault."""
 
-KUBE_TOKEN = environ.get('KUBE_TOKEN', 'fookubetoken')
+KUBE_TOKEN = _env.get('KUBE_TOKEN', 'fookubetoken')
 """Service account token for authenticating with Vault. May be a file path."""
 
-VAULT_HOST = environ.get('VAULT_HOST', 'foovaulthost')
+VAULT_HOST = _env.get('VAULT_HOST', 'foovaulthost')
 """Vault hostname/address."""
 
-VAULT_PORT = environ.get('VAULT_PORT', '1234')
+VAULT_PORT = _env.get('VAULT_PORT', '1234')
 """Vault API port."""
 
-VAULT_ROLE = environ.get('VAULT_ROLE', 'submission-ui')
+VAULT_ROLE = _env.get('VAULT_ROLE', 'submission-ui')
 """Vault role linked to this application's service account."""
 
-VAULT_CERT = environ.get('VAULT_CERT')
+VAULT_CERT = _env.get('VAULT_CERT')
 """Path to CA certificate for TLS verification when talking to Vault."""
 
-VAULT_SCHEME = environ.get('VAULT_SCHEME', 'https')
+VAULT_SCHEME = _env.get('VAULT_SCHEME', 'https')
 """Default is ``https``."""
 
 VAULT_REQUESTS = [
@@ -64,6 +67,6 @@ VAULT_REQUESTS = [
     {'type': 'aws',
      'name': 'AWS_S3_CREDENTIAL',
      'mount_point': f'aws{NS_AFFIX}/',
-     'role': environ.get('VAULT_CREDENTIAL')},
+     'role': _env.get('VAULT_CREDENTIAL')},
 ]
 """Requests for Vault secrets."""
@@ -1,14 +1,18 @@
 """Provides request controllers for the submission preview service."""
 
-from typing import Tuple, Any, Dict, IO, Union, Optional
+import time
+from types import MappingProxyType
+from typing import Tuple, Any, Dict, IO, Union, Optional, Mapping
 from http import HTTPStatus
 
 from werkzeug.exceptions import (
+    BadRequest,
     InternalServerError,
     Conflict,
     NotFound,
     ServiceUnavailable,
 )
+from werkzeug.http import http_date
 
 from arxiv.base import logging
 from .services import store
@@ -16,9 +20,25 @@ from .domain import Preview, Content
 
 logger = logging.getLogger(__name__)
 
-ResponseData = Optional[Union[Dict[str, Any], IO[bytes]]]
+ResponseData = Optional[Union[Mapping[str, Any], IO[bytes]]]
 Response = Tuple[ResponseData, HTTPStatus, Dict[str, Any]]
 
+SERVICE_OK: Mapping[str, Any] = MappingProxyType({"iam": "ok"})
+"""Response data for the status endpoint when the service is available."""
+
+AVAILABILITY_TTL = 1.0
+"""Seconds for which the result of a store availability check is reused."""
+
+_UNCHECKED: Tuple[float, bool] = (float('-inf'), False)
+_availability = _UNCHECKED
+"""Monotonic time of the last availability check, and its result."""
+
+
+def reset_availability() -> None:
+    """Forget the result of the last store availability check."""
+    global _availability
+    _availability = _UNCHECKED
+
 
 def service_status(*args: Any, **kwargs: Any) -> Response:
     """
@@ -47,12 +67,26 @@ def service_status(*args: Any, **kwargs: Any) -> Response:
     :class:`.ServiceUnavaiable`
         Raised when one or more upstream services are not available.
 
+    Notes
+    -----
+    Health probes may hit this endpoint several times per second, so the
+    result of the store check is reused for :const:`AVAILABILITY_TTL`
+    seconds. Concurrent requests may both check the store when the cached
+    result expires; that is harmless.
+
     """
-    st = store.PreviewStore.current_session()
-    if not st.is_available(read_timeout=0.5, connect_timeout=0.5, retries=1):
+    global _availability
+    checked_at, available = _availability
+    now = time.monotonic()
+    if now - checked_at >= AVAILABILITY_TTL:
+        st = store.PreviewStore.current_session()
+        available = st.is_available(read_timeout=0.5, connect_timeout=0.5,
+                                    retries=1)
+        _availability = (now, available)
+    if not available:
         logger.error("Could not connect to store")
         raise ServiceUnavailable("Cannot connect to store")
-    return {"iam": "ok"}, HTTPStatus.OK, {}
+    return SERVICE_OK, HTTPStatus.OK, {}
 
 
 def check_preview_exists(source_id: str, checksum: str) -> Response:
@@ -170,13 +204,10 @@ def get_preview_content(
     headers: Dict[str, Any]
     st = store.PreviewStore.current_session()
     try:
-        if none_match is not None:
-            preview_checksum = st.get_preview_checksum(source_id, checksum)
-            if none_match == preview_checksum:
-                headers = {"ETag": preview_checksum}
-                return None, HTTPStatus.NOT_MODIFIED, headers
-
-        preview = st.get_preview(source_id, checksum)
+        preview = st.get_preview(source_id, checksum, if_none_match=none_match)
+    except store.NotModified:
+        headers = {"ETag": none_match}
+        return None, HTTPStatus.NOT_MODIFIED, headers
     except store.DoesNotExist as e:
         raise NotFound("No preview available") from e
 
@@ -188,6 +219,7 @@ def get_preview_content(
         "ETag": preview.metadata.checksum,
         "Content-type": "application/pdf",
         "Content-Length": preview.metadata.size_bytes,
+        "Last-Modified": http_date(preview.metadata.added),
     }
     logger.debug("get_preview_content: headers: %s", headers)
     return preview.content.stream, HTTPStatus.OK, headers
@@ -226,7 +258,8 @@ def deposit_preview(
     Raises
     ------
     :class:`.BadRequest`
-        Raised when the request is incomplete.
+        Raised when the request is incomplete, or ``content_checksum`` is
+        malformed.
     :class:`.InternalServerError`
         Raised when there is a problem storing the preview.
     :class:`.Conflict`
@@ -240,6 +273,8 @@ def deposit_preview(
         preview = st.deposit(
             preview, overwrite=overwrite, checksum=content_checksum
         )
+    except store.InvalidChecksum as e:
+        raise BadRequest("Invalid content checksum") from e
     except store.DepositFailed as e:
         logger.error("An unexpected error occurred: %s", e)
         raise InternalServerError("An unexpected error occurred") from e
@@ -1,12 +1,14 @@
 """Core concepts for the submission preview service."""
 
-from typing import NamedTuple, Optional, IO
+from dataclasses import dataclass
+from typing import Optional, IO
 from datetime import datetime
 
 PDF = 'application/pdf'
 
 
-class Preview(NamedTuple):
+@dataclass(frozen=True)
+class Preview:
     """A submission preview."""
 
     source_id: str
@@ -21,7 +23,8 @@ class Preview(NamedTuple):
     """The preview content, if available."""
 
 
-class Metadata(NamedTuple):
+@dataclass(frozen=True)
+class Metadata:
     """Metadata about the preview."""
 
     added: datetime
@@ -34,7 +37,8 @@ class Metadata(NamedTuple):
     """Size of the preview."""
 
 
-class Content(NamedTuple):
+@dataclass(frozen=True)
+class Content:
     """Content of the submission preview."""
 
     stream: IO[bytes]
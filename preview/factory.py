@@ -1,6 +1,6 @@
 """Provides an application factory for the submission preview service."""
 
-from flask import Flask, Response, jsonify
+from flask import Flask, Response
 from werkzeug.exceptions import HTTPException, Forbidden, Unauthorized, \
     BadRequest, MethodNotAllowed, InternalServerError, NotFound, \
     ServiceUnavailable
@@ -12,14 +12,17 @@ from arxiv.users import auth
 
 from .services import PreviewStore
 from . import routes
-from .encode import PreviewEncoder
+from .encode import dumps
 
 
 def create_app() -> Flask:
     """Create a new API application."""
+    # Imported here rather than at module level so that the environment is
+    # read when the first app is created, e.g. after ``wsgi.application`` has
+    # copied the WSGI environ into ``os.environ``. Later apps reuse the module.
+    from . import config
     app = Flask('preview')
-    app.json_encoder = PreviewEncoder
-    app.config.from_pyfile('config.py')
+    app.config.from_object(config)
 
     Base(app)
     auth.Auth(app)
@@ -49,18 +52,12 @@ def create_app() -> Flask:
 
 def register_error_handlers(app: Flask) -> None:
     """Register error handlers for the Flask app."""
-    app.errorhandler(Forbidden)(jsonify_exception)
-    app.errorhandler(Unauthorized)(jsonify_exception)
-    app.errorhandler(BadRequest)(jsonify_exception)
-    app.errorhandler(InternalServerError)(jsonify_exception)
-    app.errorhandler(ServiceUnavailable)(jsonify_exception)
-    app.errorhandler(NotFound)(jsonify_exception)
-    app.errorhandler(MethodNotAllowed)(jsonify_exception)
+    for exception in (Forbidden, Unauthorized, BadRequest, InternalServerError,
+                      ServiceUnavailable, NotFound, MethodNotAllowed):
+        app.register_error_handler(exception, jsonify_exception)
 
 
 def jsonify_exception(error: HTTPException) -> Response:
     """Render exceptions as JSON."""
-    exc_resp = error.get_response()
-    response: Response = jsonify(reason=error.description)
-    response.status_code = exc_resp.status_code
-    return response
+    return Response(dumps({'reason': error.description}),
+                    status=error.code or 500, mimetype='application/json')
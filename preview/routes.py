@@ -1,23 +1,31 @@
 """Provides the API blueprint for the submission preview service."""
 
-import io
 from http import HTTPStatus as status
-from typing import Dict, Any, IO, Optional
+from typing import Dict, Any, IO, Optional, cast
 
-from flask import Blueprint, Response, request, make_response, send_file, \
-    current_app
-from flask.json import jsonify
+from flask import Blueprint, Response, request, current_app
 from werkzeug.exceptions import RequestEntityTooLarge, BadRequest
+from werkzeug.http import is_resource_modified
+from werkzeug.wsgi import wrap_file
 
 from arxiv.users import auth  # pylint: disable=no-name-in-module
 
 from . import controllers
+from .domain import PDF
+from .encode import dumps
 auth.scopes.READ_PREVIEW = auth.domain.Scope('preview', 'read')
 auth.scopes.CREATE_PREVIEW = auth.domain.Scope('preview', 'create')
 
 
 api = Blueprint('api', __name__, url_prefix='')
 
+_SERVICE_OK_BODY = dumps(dict(controllers.SERVICE_OK))
+"""Encoded body of :const:`.controllers.SERVICE_OK`."""
+_TRUE = frozenset({'true', 'True', '1'})
+"""Values of the ``Overwrite`` header that enable overwriting."""
+_CHUNK_SIZE = 1024 * 1024
+"""Bytes of preview content to read from the store per write to the client."""
+
 
 @api.route('/status', methods=['GET'])
 def service_status() -> Response:
@@ -27,8 +35,10 @@ def service_status() -> Response:
     Returns ``200 OK`` if the service is up and ready to handle requests.
     """
     data, code, headers = controllers.service_status(request.args)
-    response: Response = make_response(jsonify(data), code, headers)
-    return response
+    if data is controllers.SERVICE_OK:  # Skip encoding on the hot path.
+        return Response(_SERVICE_OK_BODY, status=code, headers=headers,
+                        mimetype='application/json')
+    return _json_response(data, code, headers)
 
 
 @api.route('/<source_id>/<checksum>', methods=['HEAD'])
@@ -36,8 +46,7 @@ def service_status() -> Response:
 def check_preview_exists(source_id: str, checksum: str) -> Response:
     """Verify that the preview exists."""
     data, code, headers = controllers.check_preview_exists(source_id, checksum)
-    response: Response = make_response(jsonify(data), code, headers)
-    return response
+    return _json_response(data, code, headers)
 
 
 @api.route('/<source_id>/<checksum>', methods=['GET'])
@@ -45,8 +54,7 @@ def check_preview_exists(source_id: str, checksum: str) -> Response:
 def get_preview_metadata(source_id: str, checksum: str) -> Response:
     """Returns a JSON document describing the preview."""
     data, code, headers = controllers.get_preview_metadata(source_id, checksum)
-    response: Response = make_response(jsonify(data), code, headers)
-    return response
+    return _json_response(data, code, headers)
 
 
 @api.route('/<source_id>/<checksum>/content', methods=['GET'])
@@ -57,12 +65,28 @@ def get_preview_content(source_id: str, checksum: str) -> Response:
     data, code, headers = \
         controllers.get_preview_content(source_id, checksum, none_match)
     if code == status.OK:
-        response: Response = send_file(data, mimetype=headers['Content-type'])
-    else:
-        response = make_response(jsonify(data))
-    response = _update_headers(response, headers)
-    response.status_code = code
-    return response
+        # The controller provides the length and validators up front, so the
+        # content is streamed as-is. If-Modified-Since is only evaluated when
+        # there is no If-None-Match (RFC 7232, section 3.3), which the
+        # controller has already handled; other preconditions are ignored.
+        stream = cast(IO[bytes], data)   # Content is only returned with 200.
+        if none_match is None and not is_resource_modified(
+                request.environ, last_modified=headers.get('Last-Modified')):
+            stream.close()
+            code = status.NOT_MODIFIED
+        else:
+            # Caches must revalidate against the ETag before reusing the
+            # content.
+            body = wrap_file(request.environ, stream, buffer_size=_CHUNK_SIZE)
+            response = Response(body, status=code, headers=headers,
+                                direct_passthrough=True)
+            response.cache_control.no_cache = True
+            return response
+    if code == status.NOT_MODIFIED:     # There is no body to encode.
+        response = Response(status=code, headers=headers)
+        response.cache_control.no_cache = True
+        return response
+    return _json_response(data, code, headers)
 
 
 @api.route('/<source_id>/<checksum>/content', methods=['PUT'])
@@ -70,34 +94,30 @@ def get_preview_content(source_id: str, checksum: str) -> Response:
 def deposit_preview(source_id: str, checksum: str) -> Response:
     """Creates a new preview resource at the specified key."""
     content_checksum: Optional[str] = request.headers.get('ETag', None)
-    overwrite = bool(request.headers.get('Overwrite', 'false') == 'true')
+    overwrite = request.headers.get('Overwrite', 'false') in _TRUE
 
-    stream: IO[bytes]
     if request.headers.get('Content-type') is not None:
+        if request.mimetype != PDF:
+            raise BadRequest(f'Invalid content type: {request.mimetype}')
         length = int(request.headers.get('Content-length', 0))
         if length == 0:
             raise BadRequest('Body empty or content-length not set')
         max_length = int(current_app.config['MAX_PAYLOAD_SIZE_BYTES'])
         if length > max_length:
             raise RequestEntityTooLarge(f'Body exceeds size of {max_length}')
-        stream = io.BytesIO(request.data)
-    else:
-        # DANGER! request.stream will ONLY be available if (a) the content-type
-        # header is not passed and (b) we have not accessed the body via any
-        # other means, e.g. ``.data``, ``.json``, etc.
-        stream = request.stream   # type: ignore
+    # DANGER! request.stream will ONLY be available if we have not accessed
+    # the body via any other means, e.g. ``.data``, ``.form``, ``.json``, etc.
+    # Passing it straight through lets the store upload the body as it is
+    # received, rather than buffering all of it in memory first.
+    stream: IO[bytes] = request.stream   # type: ignore
     data, code, headers = controllers.deposit_preview(
         source_id, checksum, stream,
         overwrite=overwrite,
         content_checksum=content_checksum
     )
-    response: Response = make_response(jsonify(data), code, headers)
-    return response
+    return _json_response(data, code, headers)
 
 
-def _update_headers(response: Response, headers: Dict[str, Any]) -> Response:
-    for key, value in headers.items():
-        if key in response.headers:     # Avoid duplicate headers.
-            response.headers.remove(key)   # type: ignore
-        response.headers.add(key, value)   # type: ignore
-    return response
+def _json_response(data: Any, code: int, headers: Dict[str, Any]) -> Response:
+    return Response(dumps(data), status=code, headers=headers,
+                    mimetype='application/json')
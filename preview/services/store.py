@@ -27,10 +27,10 @@ Constraints
 
 
 """
-import binascii
 import io
-from base64 import urlsafe_b64encode, urlsafe_b64decode
+from base64 import b64encode, urlsafe_b64encode, urlsafe_b64decode
 from datetime import datetime
+from functools import lru_cache
 from hashlib import md5
 from typing import IO, Tuple, Optional, Dict, Any, Union
 
@@ -41,7 +41,7 @@ from botocore.config import Config
 from botocore.exceptions import ClientError
 from flask import Flask
 from pytz import UTC
-from typing_extensions import TypedDict, Literal
+from typing_extensions import TypedDict, Literal, Protocol
 
 from arxiv.base import logging
 from arxiv.base.globals import get_application_global, get_application_config
@@ -70,7 +70,7 @@ class GetResponse(TypedDict):
     Body: IO[bytes]
 
 
-class StreamMonitor(io.BytesIO):
+class StreamMonitor(io.RawIOBase):
     """Wraps a stream to calculate checksum and size as the stream is read."""
 
     def __init__(self, stream: IO[bytes]) -> None:
@@ -78,7 +78,6 @@ class StreamMonitor(io.BytesIO):
         self._stream = stream
         self._md5 = md5()
         self.size_bytes = 0
-        super().__init__()
 
     def seekable(self) -> Literal[False]:
         """Indicate that this is a non-seekable stream."""
@@ -104,6 +103,37 @@ class StreamMonitor(io.BytesIO):
         return urlsafe_b64encode(self._md5.digest()).decode('utf-8')
         # return self._md5.hexdigest()
 
+    @property
+    def content_md5(self) -> str:
+        """Get the MD5 hash of the stream content, as for ``Content-MD5``."""
+        return b64encode(self._md5.digest()).decode('ascii')
+
+
+class Readable(Protocol):
+    """A stream that can be read from, e.g. a :class:`.StreamMonitor`."""
+
+    def read(self, size: Optional[int] = -1) -> bytes:
+        """Read up to ``size`` bytes, or to the end of the stream."""
+
+
+class PrefixedStream:
+    """Read ``prefix`` and then the rest of ``stream``."""
+
+    def __init__(self, prefix: bytes, stream: Readable) -> None:
+        """Initialize with the data to read before ``stream``."""
+        self._prefix = prefix
+        self._stream = stream
+
+    def read(self, size: Optional[int] = -1) -> bytes:
+        """Read from the prefix first, topping up from the stream."""
+        if size is None or size < 0:
+            chunk, self._prefix = self._prefix, b''
+            return chunk + self._stream.read()
+        chunk, self._prefix = self._prefix[:size], self._prefix[size:]
+        if len(chunk) < size:
+            chunk += self._stream.read(size - len(chunk))
+        return chunk
+
 
 class NoSuchBucket(Exception):
     """The configured bucket does not exist."""
@@ -117,15 +147,30 @@ class DepositFailed(Exception):
     """An attempt to deposit a preview was not successful."""
 
 
+class InvalidChecksum(DepositFailed):
+    """The checksum given to verify deposited content is malformed."""
+
+
 class PreviewAlreadyExists(Exception):
     """An attempt to deposit an existing preview was made."""
 
 
+class NotModified(Exception):
+    """The requested preview content matches the client's cached copy."""
+
+
 # TODO: enough of this is reused from other places that we may want to consider
 # adding the boilerplate to ``arxiv.integration``.
 class PreviewStore:
     """Service integration for storing previews in S3."""
 
+    # Read and hash the content in large slices. Content below the multipart
+    # threshold is sent in a single PUT, which keeps the ETag equal to the MD5
+    # of the content; we rely on that for checksums.
+    _TRANSFER_CONFIG = TransferConfig(io_chunksize=1024 * 1024,
+                                      multipart_threshold=8 * 1024 * 1024,
+                                      multipart_chunksize=8 * 1024 * 1024)
+
     def __init__(self, bucket: str, verify: bool = False,
                  region_name: Optional[str] = None,
                  endpoint_url: Optional[str] = None,
@@ -151,8 +196,10 @@ class PreviewStore:
         if self._endpoint_url:
             params['endpoint_url'] = self._endpoint_url
             params['verify'] = self._verify
+        if config is None:
+            return _shared_client(**params)
         logger.debug('new client with params %s', params)
-        return boto3.client('s3', **params)
+        return boto3.client('s3', config=config, **params)
 
     def _handle_client_error(self, exc: ClientError) -> None:
         logger.error('error: %s', str(exc.response))
@@ -162,6 +209,8 @@ class PreviewStore:
         if exc.response['Error']['Code'] == "NoSuchKey" \
                 or exc.response['Error']['Code'] == '404':
             raise DoesNotExist(f'No such object in {self._bucket}') from exc
+        if exc.response['Error']['Code'] == '304':
+            raise NotModified('Preview content not modified') from exc
         logger.error('Unhandled ClientError: %s', exc)
         raise RuntimeError('Unhandled ClientError') from exc
 
@@ -187,8 +236,9 @@ class PreviewStore:
                   connect_timeout: int = 5) -> None:
         """Test the connection to S3 by putting a tiny object."""
         # Use a new client with a short timeout and no retries by default; we
-        # want to fail fast here.
-        config = Config(retries={'max_attempts': retries},
+        # want to fail fast here. Any retries back off with jitter, so that a
+        # transient throttling error doesn't fail the check.
+        config = Config(retries={'max_attempts': retries, 'mode': 'standard'},
                         read_timeout=read_timeout,
                         connect_timeout=connect_timeout)
         client = self._new_client(config=config)
@@ -234,7 +284,7 @@ class PreviewStore:
     def _create_bucket(self, retries: int = 2, read_timeout: int = 5,
                        connect_timeout: int = 5) -> None:
         """Create S3 bucket."""
-        config = Config(retries={'max_attempts': retries},
+        config = Config(retries={'max_attempts': retries, 'mode': 'standard'},
                         read_timeout=read_timeout,
                         connect_timeout=connect_timeout)
         client = self._new_client(config=config)
@@ -267,9 +317,9 @@ class PreviewStore:
         g = get_application_global()
         if g is None:
             return cls.get_session()
-        if 'store' not in g:
-            g.store = cls.get_session()
-        store: PreviewStore = g.store
+        store: Optional[PreviewStore] = getattr(g, 'store', None)
+        if store is None:
+            store = g.store = cls.get_session()
         return store
 
     def _key(self, source_id: str, checksum: str) -> str:
@@ -304,6 +354,8 @@ class PreviewStore:
         :class:`.PreviewAlreadyExists`
             Raised if an attempt is made to write a preview, and ``overwrite``
             is False.
+        :class:`.InvalidChecksum`
+            Raised if ``checksum`` is not a base64-encoded MD5 digest.
         :class:`.DepositFailed`
             Raised if the preview content could not be deposited.
 
@@ -312,29 +364,60 @@ class PreviewStore:
             logger.error('Content is missing')
             raise DepositFailed('Content is missing')
 
+        key = self._key(preview.source_id, preview.checksum)
         if not overwrite:
             try:
-                self.get_metadata(preview.source_id, preview.checksum)
+                self._head(key)
                 logger.error('Preview already exists: %s @ %s',
                              preview.source_id, preview.checksum)
                 raise PreviewAlreadyExists('Preview content already exists')
             except DoesNotExist:
                 pass
-        key = self._key(preview.source_id, preview.checksum)
+        expected_md5: Optional[str] = None
+        if checksum is not None:
+            digest = _b64_to_digest(checksum)
+            if digest is None or len(digest) != 16:
+                msg = f'Checksum validation failed. Invalid `{checksum}`'
+                logger.error(msg)
+                raise InvalidChecksum(msg)
+            expected_md5 = b64encode(digest).decode('ascii')
+
         monitor = StreamMonitor(preview.content.stream)
+        threshold = self._TRANSFER_CONFIG.multipart_threshold
         try:
-            self.client.upload_fileobj(monitor, self._bucket, key,
-                                       Config=TransferConfig(io_chunksize=4096))
+            # Most previews are small enough to send in a single PUT. Doing
+            # that ourselves skips the transfer manager's thread pool and the
+            # ``Expect: 100-continue`` round trip for file-like bodies. If we
+            # were given a checksum, S3 verifies it and rejects a mismatch
+            # without storing anything.
+            head = monitor.read(threshold)
+            if len(head) < threshold:
+                self.client.put_object(
+                    Bucket=self._bucket, Key=key, Body=head,
+                    ContentMD5=expected_md5 or monitor.content_md5
+                )
+            else:
+                self.client.upload_fileobj(PrefixedStream(head, monitor),
+                                           self._bucket, key,
+                                           Config=self._TRANSFER_CONFIG)
         except ClientError as exc:
+            if exc.response['Error']['Code'] == 'BadDigest':
+                msg = ('Checksum validation failed. Expected'
+                       f' `{checksum}`, got `{monitor.checksum}`')
+                logger.error(msg)
+                raise DepositFailed(msg) from exc
             try:
                 self._handle_client_error(exc)
             except RuntimeError as e:
                 logger.error('An unexpected error occurred: %s', e)
                 raise DepositFailed('Could not deposit preview') from e
 
-        if checksum is not None and monitor.checksum != checksum:
+        # Multipart uploads, and backends that ignore Content-MD5, store the
+        # content regardless; remove it if it doesn't match.
+        content_checksum = monitor.checksum
+        if checksum is not None and content_checksum != checksum:
             msg = ('Checksum validation failed. Expected'
-                   f' `{checksum}`, got `{monitor.checksum}`')
+                   f' `{checksum}`, got `{content_checksum}`')
             logger.error(msg)
             self.client.delete_object(Bucket=self._bucket, Key=key)
             raise DepositFailed(msg)
@@ -343,7 +426,7 @@ class PreviewStore:
                        checksum=preview.checksum,
                        content=preview.content,
                        metadata=Metadata(
-                           checksum=monitor.checksum,
+                           checksum=content_checksum,
                            added=datetime.now(UTC),
                            size_bytes=monitor.size_bytes))
 
@@ -367,42 +450,70 @@ class PreviewStore:
         :class:`.DoesNotExist`
 
         """
-        key = self._key(source_id, checksum)
-        try:
-            resp: HeadResponse = self.client.head_object(
-                Bucket=self._bucket,
-                Key=key
-            )
-        except ClientError as e:
-            self._handle_client_error(e)
-        return Metadata(checksum=_hex_to_b64(resp['ETag'][1:-1]),
+        resp = self._head(self._key(source_id, checksum))
+        return Metadata(checksum=_hex_to_b64(resp['ETag']),
                         added=resp['LastModified'],
                         size_bytes=resp['ContentLength'])
 
     def get_preview_checksum(self, source_id: str, checksum: str) -> str:
         """Get the preview content checksum via HEAD request."""
+        resp = self._head(self._key(source_id, checksum))
+        return _hex_to_b64(resp['ETag'])
+
+    def _head(self, key: str) -> HeadResponse:
+        """Get the object at ``key`` via HEAD request."""
         try:
-            resp: HeadResponse = self.client.head_object(
-                Bucket=self._bucket,
-                Key=self._key(source_id, checksum)
-            )
+            resp: HeadResponse = self.client.head_object(Bucket=self._bucket,
+                                                         Key=key)
         except ClientError as e:
             self._handle_client_error(e)
-        return _hex_to_b64(resp['ETag'][1:-1])
+        return resp
+
+    def get_preview(self, source_id: str, checksum: str,
+                    if_none_match: Optional[str] = None) -> Preview:
+        """
+        Get the preview including its content.
+
+        Parameters
+        ----------
+        source_id : str
+            Identifier of the source package.
+        checksum: str
+            Checksum of the source package.
+        if_none_match : str or None
+            If provided, the URL-safe base64-encoded checksum of preview
+            content that the caller already has. The condition is evaluated
+            by S3, so no content is transferred if it matches.
+
+        Returns
+        -------
+        :class:`.Preview`
 
-    def get_preview(self, source_id: str, checksum: str) -> Preview:
-        """Get the preview including its content."""
+        Raises
+        ------
+        :class:`.DoesNotExist`
+        :class:`.NotModified`
+            Raised if ``if_none_match`` matches the current preview content.
+
+        """
+        params: Dict[str, Any] = {'Bucket': self._bucket,
+                                  'Key': self._key(source_id, checksum)}
+        if if_none_match is not None:
+            etag = _b64_to_hex(if_none_match)
+            if etag is not None:    # Otherwise it cannot match anything.
+                params['IfNoneMatch'] = f'"{etag}"'
         try:
-            resp: GetResponse = self.client.get_object(
-                Bucket=self._bucket,
-                Key=self._key(source_id, checksum)
-            )
+            resp: GetResponse = self.client.get_object(**params)
         except ClientError as e:
             self._handle_client_error(e)
+        # Not all S3-compatible backends honor IfNoneMatch on GET.
+        if 'IfNoneMatch' in params and resp['ETag'] == params['IfNoneMatch']:
+            resp['Body'].close()
+            raise NotModified('Preview content not modified')
         return Preview(source_id=source_id,
                        checksum=checksum,
                        metadata=Metadata(
-                           checksum=_hex_to_b64(resp['ETag'][1:-1]),
+                           checksum=_hex_to_b64(resp['ETag']),
                            added=resp['LastModified'],
                            size_bytes=resp['ContentLength']
                         ),
@@ -410,6 +521,45 @@ class PreviewStore:
 
 
 
+@lru_cache(maxsize=1)
+def _shared_client(**params: Any) -> boto3.client:
+    """
+    Get an S3 client for ``params`` that is shared within this process.
+
+    Building a client loads and parses the service model, which is expensive
+    compared to most of the requests that we make with it. Clients are
+    thread-safe, so one per set of connection parameters is enough. Since
+    the client is shared by all request threads, its connection pool is
+    larger than botocore's default of 10.
+
+    Only the most recent client is kept: the parameters include credentials,
+    which change when they are rotated (e.g. by Vault), and the client (and
+    its connection pool) for the old credentials should then be released.
+    """
+    logger.debug('new shared client with params %s', params)
+    return boto3.client('s3', config=Config(max_pool_connections=50),
+                        **params)
+
+
 def _hex_to_b64(etag: str) -> str:
-    """Convert an hexdigest of an MD5 to a URL-safe base64-encoded digest."""
-    return urlsafe_b64encode(binascii.unhexlify(etag)).decode('utf-8')
+    """Convert the (quoted) ETag of an MD5 to a URL-safe base64 digest."""
+    return urlsafe_b64encode(bytes.fromhex(etag.strip('"'))).decode('ascii')
+
+
+def _b64_to_hex(checksum: str) -> Optional[str]:
+    """Convert a URL-safe base64-encoded digest to a hexdigest, if valid."""
+    digest = _b64_to_digest(checksum)
+    return digest.hex() if digest is not None else None
+
+
+def _b64_to_digest(checksum: str) -> Optional[bytes]:
+    """Decode a URL-safe base64-encoded digest, if valid."""
+    try:
+        digest = urlsafe_b64decode(checksum)
+    except ValueError:     # Includes binascii.Error.
+        return None
+    # The decoder ignores trailing garbage and non-zero padding bits, so only
+    # accept checksums that we would have produced ourselves.
+    if urlsafe_b64encode(digest).decode('utf-8') != checksum:
+        return None
+    return digest
@@ -4,6 +4,7 @@ import io
 from unittest import TestCase, mock
 from moto import mock_s3
 import boto3
+from botocore.exceptions import ClientError
 
 from . import store
 from ..domain import Preview, Metadata, Content
@@ -25,6 +26,20 @@ class TestStorePreview(TestCase):
         }
         self.store = store.PreviewStore.current_session()
 
+    def test_rotated_credentials(self):
+        """Clients for superseded credentials are not kept around."""
+        first = store.PreviewStore('foobucket', region_name='us-east-1',
+                                   aws_access_key_id='fookey1',
+                                   aws_secret_access_key='foosecret1')
+        second = store.PreviewStore('foobucket', region_name='us-east-1',
+                                    aws_access_key_id='fookey2',
+                                    aws_secret_access_key='foosecret2')
+        self.assertIsNot(first.client, second.client,
+                         'Each set of credentials gets its own client')
+        self.assertEqual(store._shared_client.cache_info().currsize, 1,
+                         'Only the client for the latest credentials is'
+                         ' shared')
+
     @mock_s3
     def test_deposit(self):
         """Deposit a preview and then load it."""
@@ -60,6 +75,30 @@ class TestStorePreview(TestCase):
         self.assertEqual(loaded.content.stream.read(), b'foocontent',
                          'Loads original content')
 
+    @mock_s3
+    @mock.patch(f'{store.__name__}.PreviewStore._TRANSFER_CONFIG',
+                store.TransferConfig(multipart_threshold=4))
+    def test_deposit_above_threshold(self):
+        """Deposit a preview too large to send in a single request."""
+        self.store.initialize()
+        stream = io.BytesIO(b'foocontent')
+        preview = Preview(source_id='1234',
+                          checksum='foochex==',
+                          content=Content(stream=stream))
+        after = self.store.deposit(preview)
+        self.assertEqual(after.metadata.size_bytes, 10, 'Calculates size')
+        self.assertEqual(after.metadata.checksum,
+                         'ewrggAHdCT55M1uUfwKLEA==',
+                         'Calculates checksum')
+
+        # A multipart ETag is not an MD5, so read the stored object directly.
+        resp = self.store.client.get_object(
+            Bucket='foobucket',
+            Key='preview/1234/foochex==/1234.pdf'
+        )
+        self.assertEqual(resp['Body'].read(), b'foocontent',
+                         'Stores original content')
+
     @mock_s3
     def test_deposit_checksum_fails(self):
         """Deposit a preview but checksum validation fails."""
@@ -68,7 +107,7 @@ class TestStorePreview(TestCase):
         preview = Preview(source_id='1234',
                           checksum='foochex==',
                           content=Content(stream=stream))
-        with self.assertRaises(store.DepositFailed):
+        with self.assertRaises(store.InvalidChecksum):
             self.store.deposit(preview, checksum='somethingelse==')
 
         with self.assertRaises(store.DoesNotExist):
@@ -77,6 +116,52 @@ class TestStorePreview(TestCase):
         with self.assertRaises(store.DoesNotExist):
             self.store.get_preview('1234', 'foochex==')
 
+    @mock_s3
+    def test_deposit_existing_invalid_checksum(self):
+        """Deposit an existing preview with a malformed checksum."""
+        self.store.initialize()
+        existing = Preview(source_id='1234',
+                           checksum='foochex==',
+                           content=Content(stream=io.BytesIO(b'foocontent')))
+        self.store.deposit(existing)
+        preview = Preview(source_id='1234',
+                          checksum='foochex==',
+                          content=Content(stream=io.BytesIO(b'barcontent')))
+        with self.assertRaises(store.PreviewAlreadyExists):
+            self.store.deposit(preview, checksum='somethingelse==')
+
+    @mock_s3
+    def test_deposit_checksum_mismatch(self):
+        """Deposit a preview with a well-formed checksum that doesn't match."""
+        self.store.initialize()
+        stream = io.BytesIO(b'foocontent')
+        preview = Preview(source_id='1234',
+                          checksum='foochex==',
+                          content=Content(stream=stream))
+        with self.assertRaises(store.DepositFailed):
+            self.store.deposit(preview, checksum='AAAAAAAAAAAAAAAAAAAAAA==')
+
+        with self.assertRaises(store.DoesNotExist):
+            self.store.get_metadata('1234', 'foochex==')
+
+    @mock_s3
+    def test_deposit_checksum_rejected(self):
+        """S3 rejects the content because it doesn't match the checksum."""
+        self.store.initialize()
+        stream = io.BytesIO(b'foocontent')
+        preview = Preview(source_id='1234',
+                          checksum='foochex==',
+                          content=Content(stream=stream))
+        error = ClientError({'Error': {'Code': 'BadDigest'}}, 'PutObject')
+        with mock.patch.object(self.store.client, 'put_object',
+                               side_effect=error) as mock_put:
+            with self.assertRaises(store.DepositFailed):
+                self.store.deposit(preview,
+                                   checksum='AAAAAAAAAAAAAAAAAAAAAA==')
+        self.assertEqual(mock_put.call_args[1]['ContentMD5'],
+                         'AAAAAAAAAAAAAAAAAAAAAA==',
+                         'Sends the expected checksum as Content-MD5')
+
     @mock_s3
     def test_deposit_checksum_passes(self):
         """Deposit a preview and checksum validation passes."""
@@ -90,6 +175,26 @@ class TestStorePreview(TestCase):
         except store.DepositFailed as e:
             self.fail(f'Checksum validation should pass: {e}')
 
+    @mock_s3
+    def test_retrieve_not_modified(self):
+        """Retrieve a preview conditionally on its checksum."""
+        self.store.initialize()
+        stream = io.BytesIO(b'foocontent')
+        preview = Preview(source_id='1234',
+                          checksum='foochex==',
+                          content=Content(stream=stream))
+        after = self.store.deposit(preview)
+
+        with self.assertRaises(store.NotModified):
+            self.store.get_preview('1234', 'foochex==',
+                                   if_none_match=after.metadata.checksum)
+
+        other_checksum = 'AAAAAAAAAAAAAAAAAAAAAA=='
+        loaded = self.store.get_preview('1234', 'foochex==',
+                                        if_none_match=other_checksum)
+        self.assertEqual(loaded.content.stream.read(), b'foocontent',
+                         'Loads content when the checksum does not match')
+
     @mock_s3
     def test_retrieve_nonexistant(self):
         """Deposit a preview and then load it."""
@@ -17,38 +17,58 @@ from .. import controllers
 class TestStatusEndpoint(TestCase):
     """Status endpoint should reflect availability of storage integration."""
 
-    @mock.patch(f'{controllers.__name__}.store.PreviewStore.current_session')
+    def setUp(self):
+        """Start without a cached availability check."""
+        controllers.reset_availability()
+        self.addCleanup(controllers.reset_availability)
+
+    @mock.patch.object(store.PreviewStore, 'current_session')
     def test_store_is_unavailable(self, mock_current_session):
         """Storage service is unavailable."""
-        mock_store = mock.MagicMock()
+        mock_store = mock.Mock(spec=store.PreviewStore)
         mock_store.is_available.return_value = False
         mock_current_session.return_value = mock_store
         with self.assertRaises(ServiceUnavailable):
             controllers.service_status()
 
-    @mock.patch(f'{controllers.__name__}.store.PreviewStore.current_session')
+    @mock.patch.object(store.PreviewStore, 'current_session')
     def test_store_is_available(self, mock_current_session):
         """Storage service is available."""
-        mock_store = mock.MagicMock()
+        mock_store = mock.Mock(spec=store.PreviewStore)
         mock_store.is_available.return_value = True
         mock_current_session.return_value = mock_store
         _, code, _ = controllers.service_status()
         self.assertEqual(code, status.OK)
 
+    @mock.patch(f'{controllers.__name__}.AVAILABILITY_TTL', 60)
+    @mock.patch.object(store.PreviewStore, 'current_session')
+    def test_availability_is_cached(self, mock_current_session):
+        """Repeated checks within the TTL do not hit the store."""
+        mock_store = mock.Mock(spec=store.PreviewStore)
+        mock_store.is_available.return_value = True
+        mock_current_session.return_value = mock_store
+        controllers.service_status()
+        mock_store.is_available.return_value = False
+        _, code, _ = controllers.service_status()
+        self.assertEqual(code, status.OK)
+        self.assertEqual(mock_store.is_available.call_count, 1)
+
 
 class TestDepositPreview(TestCase):
     """Tests for :func:`.controllers.deposit_preview` controller."""
 
+    # All requests are in the context of a source + checksum.
+    source_id = '12345'
+    checksum = 'asdfqwert1=='
+
     def setUp(self):
-        """All requests are in the context of a source + checksum."""
-        self.source_id = '12345'
-        self.checksum = 'asdfqwert1=='
+        """Each deposit consumes its own stream."""
         self.stream = io.BytesIO(b'fakecontent')
 
-    @mock.patch(f'{store.__name__}.PreviewStore.current_session')
+    @mock.patch.object(store.PreviewStore, 'current_session')
     def test_deposit_fails(self, mock_current_session):
         """An error occurs when storing the preview."""
-        mock_store = mock.MagicMock()
+        mock_store = mock.Mock(spec=store.PreviewStore)
         mock_store.deposit.side_effect = store.DepositFailed
         mock_current_session.return_value = mock_store
 
@@ -56,10 +76,21 @@ class TestDepositPreview(TestCase):
             controllers.deposit_preview(self.source_id, self.checksum,
                                         self.stream)
 
-    @mock.patch(f'{store.__name__}.PreviewStore.current_session')
+    @mock.patch.object(store.PreviewStore, 'current_session')
+    def test_invalid_checksum(self, mock_current_session):
+        """The content checksum is malformed."""
+        mock_store = mock.Mock(spec=store.PreviewStore)
+        mock_store.deposit.side_effect = store.InvalidChecksum
+        mock_current_session.return_value = mock_store
+
+        with self.assertRaises(BadRequest):     # 400 Bad Request
+            controllers.deposit_preview(self.source_id, self.checksum,
+                                        self.stream, 'notachecksum')
+
+    @mock.patch.object(store.PreviewStore, 'current_session')
     def test_already_exists(self, mock_current_session):
         """The preview already exists."""
-        mock_store = mock.MagicMock()
+        mock_store = mock.Mock(spec=store.PreviewStore)
         mock_store.deposit.side_effect = store.PreviewAlreadyExists
         mock_current_session.return_value = mock_store
 
@@ -67,10 +98,10 @@ class TestDepositPreview(TestCase):
             controllers.deposit_preview(self.source_id, self.checksum,
                                         self.stream)
 
-    @mock.patch(f'{store.__name__}.PreviewStore.current_session')
+    @mock.patch.object(store.PreviewStore, 'current_session')
     def test_deposit_return_malformed(self, mock_current_session):
         """The store service returns malformed data."""
-        mock_store = mock.MagicMock()
+        mock_store = mock.Mock(spec=store.PreviewStore)
         # Doesn't add metadata.
         mock_store.deposit.side_effect = lambda obj, **kw: obj
         mock_current_session.return_value = mock_store
@@ -79,10 +110,10 @@ class TestDepositPreview(TestCase):
             controllers.deposit_preview(self.source_id, self.checksum,
                                         self.stream)
 
-    @mock.patch(f'{store.__name__}.PreviewStore.current_session')
+    @mock.patch.object(store.PreviewStore, 'current_session')
     def test_deposit_successful(self, mock_current_session):
         """The preview is deposited successfully."""
-        mock_store = mock.MagicMock()
+        mock_store = mock.Mock(spec=store.PreviewStore)
         added = datetime.now(UTC)
 
         def mock_deposit(obj, overwrite, **kwargs):
@@ -111,27 +142,25 @@ class TestDepositPreview(TestCase):
 class TestRetrievePreviewMetadata(TestCase):
     """Tests for :func:`.controllers.get_preview_metadata` controller."""
 
-    def setUp(self):
-        """All requests are in the context of a source + checksum."""
-        self.source_id = '12345'
-        self.checksum = 'asdfqwert1=='
-        self.stream = io.BytesIO(b'fakecontent')
+    # All requests are in the context of a source + checksum.
+    source_id = '12345'
+    checksum = 'asdfqwert1=='
 
-    @mock.patch(f'{store.__name__}.PreviewStore.current_session')
+    @mock.patch.object(store.PreviewStore, 'current_session')
     def test_does_not_exist(self, mock_current_session):
         """The requested preview does not exist."""
-        mock_store = mock.MagicMock()
+        mock_store = mock.Mock(spec=store.PreviewStore)
         mock_store.get_metadata.side_effect = store.DoesNotExist
         mock_current_session.return_value = mock_store
 
         with self.assertRaises(NotFound):
             controllers.get_preview_metadata(self.source_id, self.checksum)
 
-    @mock.patch(f'{store.__name__}.PreviewStore.current_session')
+    @mock.patch.object(store.PreviewStore, 'current_session')
     def test_exists(self, mock_current_session):
         """The requested preview does exist."""
         added = datetime.now(UTC)
-        mock_store = mock.MagicMock()
+        mock_store = mock.Mock(spec=store.PreviewStore)
         mock_store.get_metadata.return_value = \
             Metadata(added=added, checksum='foopdfchex==', size_bytes=1_234)
         mock_current_session.return_value = mock_store
@@ -150,27 +179,24 @@ class TestRetrievePreviewMetadata(TestCase):
 class TestPreviewExists(TestCase):
     """Tests for :func:`.controllers.check_preview_exists` controller."""
 
-    def setUp(self):
-        """All requests are in the context of a source + checksum."""
-        self.source_id = '12345'
-        self.checksum = 'asdfqwert1=='
-        self.stream = io.BytesIO(b'fakecontent')
+    # All requests are in the context of a source + checksum.
+    source_id = '12345'
+    checksum = 'asdfqwert1=='
 
-    @mock.patch(f'{store.__name__}.PreviewStore.current_session')
+    @mock.patch.object(store.PreviewStore, 'current_session')
     def test_does_not_exist(self, mock_current_session):
         """The requested preview does not exist."""
-        mock_store = mock.MagicMock()
+        mock_store = mock.Mock(spec=store.PreviewStore)
         mock_store.get_preview_checksum.side_effect = store.DoesNotExist
         mock_current_session.return_value = mock_store
 
         with self.assertRaises(NotFound):
             controllers.check_preview_exists(self.source_id, self.checksum)
 
-    @mock.patch(f'{store.__name__}.PreviewStore.current_session')
+    @mock.patch.object(store.PreviewStore, 'current_session')
     def test_exists(self, mock_current_session):
         """The requested preview does exist."""
-        added = datetime.now(UTC)
-        mock_store = mock.MagicMock()
+        mock_store = mock.Mock(spec=store.PreviewStore)
         mock_store.get_preview_checksum.return_value = 'foopdfchex=='
         mock_current_session.return_value = mock_store
 
@@ -184,32 +210,31 @@ class TestPreviewExists(TestCase):
 class TestRetrievePreviewContent(TestCase):
     """Tests for :func:`.controllers.get_preview_content` controller."""
 
-    def setUp(self):
-        """All requests are in the context of a source + checksum."""
-        self.source_id = '12345'
-        self.checksum = 'asdfqwert1=='
-        self.stream = io.BytesIO(b'fakecontent')
+    # All requests are in the context of a source + checksum.
+    source_id = '12345'
+    checksum = 'asdfqwert1=='
+    added = datetime.now(UTC)
+    metadata = Metadata(added=added, checksum='foopdfchex==',
+                        size_bytes=1_234)
 
-    @mock.patch(f'{store.__name__}.PreviewStore.current_session')
+    @mock.patch.object(store.PreviewStore, 'current_session')
     def test_does_not_exist(self, mock_current_session):
         """The requested preview does not exist."""
-        mock_store = mock.MagicMock()
+        mock_store = mock.Mock(spec=store.PreviewStore)
         mock_store.get_preview.side_effect = store.DoesNotExist
         mock_current_session.return_value = mock_store
 
         with self.assertRaises(NotFound):
             controllers.get_preview_content(self.source_id, self.checksum)
 
-    @mock.patch(f'{store.__name__}.PreviewStore.current_session')
+    @mock.patch.object(store.PreviewStore, 'current_session')
     def test_exists(self, mock_current_session):
         """The requested preview does exist."""
-        added = datetime.now(UTC)
-        mock_store = mock.MagicMock()
+        mock_store = mock.Mock(spec=store.PreviewStore)
         mock_store.get_preview.return_value = Preview(
             source_id=self.source_id,
             checksum=self.checksum,
-            metadata=Metadata(added=added, checksum='foopdfchex==',
-                              size_bytes=1_234),
+            metadata=self.metadata,
             content=Content(stream=io.BytesIO(b'fakecontent'))
         )
         mock_current_session.return_value = mock_store
@@ -221,33 +246,32 @@ class TestRetrievePreviewContent(TestCase):
                          'ETag is set to the preview checksum')
         self.assertEqual(data.read(), b'fakecontent', 'Returns content stream')
 
-    @mock.patch(f'{store.__name__}.PreviewStore.current_session')
+    @mock.patch.object(store.PreviewStore, 'current_session')
     def test_if_none_match_matches(self, mock_current_session):
         """Request includes if-none-match param with matching etag."""
-        added = datetime.now(UTC)
-        mock_store = mock.MagicMock()
-        mock_store.get_preview_checksum.return_value = 'foopdfchex=='
+        mock_store = mock.Mock(spec=store.PreviewStore)
+        mock_store.get_preview.side_effect = store.NotModified
         mock_current_session.return_value = mock_store
 
         data, code, headers = \
             controllers.get_preview_content(self.source_id, self.checksum,
                                             'foopdfchex==')
+        mock_store.get_preview.assert_called_with(
+            self.source_id, self.checksum, if_none_match='foopdfchex=='
+        )
         self.assertEqual(code, status.NOT_MODIFIED, 'Returns 304 Not Modified')
         self.assertEqual(headers['ETag'], 'foopdfchex==',
                          'ETag is set to the preview checksum')
         self.assertIsNone(data, 'Returns no data')
 
-    @mock.patch(f'{store.__name__}.PreviewStore.current_session')
+    @mock.patch.object(store.PreviewStore, 'current_session')
     def test_if_none_match_does_not_match(self, mock_current_session):
         """Request includes if-none-match param with non-matching etag."""
-        added = datetime.now(UTC)
-        mock_store = mock.MagicMock()
-        mock_store.get_preview_checksum.return_value = 'foopdfchex=='
+        mock_store = mock.Mock(spec=store.PreviewStore)
         mock_store.get_preview.return_value = Preview(
             source_id=self.source_id,
             checksum=self.checksum,
-            metadata=Metadata(added=added, checksum='foopdfchex==',
-                              size_bytes=1_234),
+            metadata=self.metadata,
             content=Content(stream=io.BytesIO(b'fakecontent'))
         )
         mock_current_session.return_value = mock_store
@@ -2,6 +2,7 @@
 
 import io
 import os
+from typing import Tuple
 from unittest import TestCase, mock
 from http import HTTPStatus as status
 from flask import Flask
@@ -18,69 +19,96 @@ auth.scopes.CREATE_PREVIEW = auth.domain.Scope('preview', 'create')
 
 os.environ['JWT_SECRET'] = 'foosecret'
 
+FAKE_CONTENT = b'fakecontent'
+PDF_HEADERS = {'Content-type': 'application/pdf', 'ETag': 'foobar1=='}
+SOURCE_ID = '12345'
+CHECKSUM = 'asdf1234=='
+METADATA_URL = f'/{SOURCE_ID}/{CHECKSUM}'
+CONTENT_URL = f'{METADATA_URL}/content'
 
-class APITest(TestCase):
-    def setUp(self):
-        """We have an app."""
-        self.app = Flask('test')
-        self.app.config['JWT_SECRET'] = 'foosecret'
-        self.app.config['MAX_PAYLOAD_SIZE_BYTES'] = 10 * 1_028
 
-        auth.Auth(self.app)
+class APITest(TestCase):
+    patched_controllers: Tuple[str, ...] = ()
+    """Names of the controllers that are replaced with mocks for the class."""
+
+    @classmethod
+    def setUpClass(cls):
+        """We have an app, and mock controllers."""
+        cls._patchers = [mock.patch.object(routes.controllers, name)
+                         for name in cls.patched_controllers]
+        cls.mock_controllers = {name: patcher.start() for name, patcher
+                                in zip(cls.patched_controllers, cls._patchers)}
+
+        cls.app = Flask('test')
+        cls.app.config['JWT_SECRET'] = 'foosecret'
+        cls.app.config['MAX_PAYLOAD_SIZE_BYTES'] = 10 * 1_028
+
+        auth.Auth(cls.app)
+
+        wrap(cls.app, [auth.middleware.AuthMiddleware])
+        cls.app.register_blueprint(routes.api)
+        cls.client = cls.app.test_client()
+        with cls.app.app_context():
+            cls.token = generate_token('123', 'foo@user.com', 'foouser',
+                                       scope=[auth.scopes.READ_PREVIEW,
+                                              auth.scopes.CREATE_PREVIEW])
+
+    @classmethod
+    def tearDownClass(cls):
+        """Restore the controllers."""
+        for patcher in cls._patchers:
+            patcher.stop()
 
-        wrap(self.app, [auth.middleware.AuthMiddleware])
-        self.app.register_blueprint(routes.api)
-        self.client = self.app.test_client()
-        with self.app.app_context():
-            self.token = generate_token('123', 'foo@user.com', 'foouser',
-                                        scope=[auth.scopes.READ_PREVIEW,
-                                               auth.scopes.CREATE_PREVIEW])
+    def setUp(self):
+        """Mock controllers start out fresh in each test."""
+        for mock_controller in self.mock_controllers.values():
+            mock_controller.reset_mock(return_value=True, side_effect=True)
+
+    def assertMethodsNotAllowed(self, url, methods):
+        """Requests to ``url`` with ``methods`` are 405 Method Not Allowed."""
+        for method in methods:
+            with self.subTest(method=method):
+                response = self.client.open(
+                    url,
+                    method=method,
+                    headers={'Authorization': self.token}
+                )
+                self.assertEqual(response.status_code,
+                                 status.METHOD_NOT_ALLOWED,
+                                 f'{method} method is 405 Method Not Allowed')
 
 
 class TestServiceStatus(APITest):
     """The service status endpoint indicates that the service is available."""
 
-    @mock.patch(f'{routes.__name__}.controllers.service_status')
-    def test_get_status(self, mock_controller):
+    patched_controllers = ('service_status',)
+
+    def test_get_status(self):
         """GET the status endpoint."""
+        mock_controller = self.mock_controllers['service_status']
         mock_controller.return_value = ({}, status.OK, {})
         response = self.client.get('/status')
         self.assertEqual(response.status_code, status.OK,
                          'Returns with status code set by controller')
 
-    @mock.patch(f'{routes.__name__}.controllers.service_status')
-    def test_post_status(self, mock_controller):
-        """POST the status endpoint."""
-        response = self.client.post('/status')
-        self.assertEqual(response.status_code, status.METHOD_NOT_ALLOWED,
-                         'POST method is 405 Method Not Allowed')
-
-    @mock.patch(f'{routes.__name__}.controllers.service_status')
-    def test_put_status(self, mock_controller):
-        """PUT the status endpoint."""
-        response = self.client.put('/status')
-        self.assertEqual(response.status_code, status.METHOD_NOT_ALLOWED,
-                         'PUT method is 405 Method Not Allowed')
-
-    @mock.patch(f'{routes.__name__}.controllers.service_status')
-    def test_delete_status(self, mock_controller):
-        """DELETE the status endpoint."""
-        response = self.client.delete('/status')
-        self.assertEqual(response.status_code, status.METHOD_NOT_ALLOWED,
-                         'DELETE method is 405 Method Not Allowed')
+    def test_disallowed_methods(self):
+        """Only GET is allowed on the status endpoint."""
+        self.assertMethodsNotAllowed('/status', ['POST', 'PUT', 'DELETE'])
 
 
 class TestPreviewMetadata(APITest):
     """The metadata endpoint returns details about the preview."""
 
-    @mock.patch(f'{routes.__name__}.controllers.get_preview_metadata')
-    def test_get_preview_metadata(self, mock_controller):
+    patched_controllers = ('get_preview_metadata',)
+
+    def test_get_preview_metadata(self):
         """GET the preview metadata endpoint."""
+        mock_controller = self.mock_controllers['get_preview_metadata']
         mock_controller.return_value = ({'foo': 'bar'}, status.OK, {})
-        response = self.client.get('/12345/asdf1234==',
+        response = self.client.get(METADATA_URL,
                                    headers={'Authorization': self.token})
 
-        mock_controller.assert_called_with('12345', 'asdf1234==')
+        mock_controller.assert_called_with(SOURCE_ID, CHECKSUM)
         self.assertEqual(response.status_code, status.OK,
                          'Returns with status code set by controller')
         self.assertEqual(response.headers['Content-type'],
@@ -91,87 +119,118 @@ class TestPreviewMetadata(APITest):
         self.assertDictEqual(data, {'foo': 'bar'},
                              'Serializes the data returned by the controller')
 
-
-    @mock.patch(f'{routes.__name__}.controllers.get_preview_metadata')
-    def test_post_preview_metadata(self, mock_controller):
-        """POST the preview metadata endpoint."""
-        response = self.client.post('/12345/asdf1234==',
-                                    headers={'Authorization': self.token})
-        self.assertEqual(response.status_code, status.METHOD_NOT_ALLOWED,
-                         'POST method is 405 Method Not Allowed')
-
-    @mock.patch(f'{routes.__name__}.controllers.get_preview_metadata')
-    def test_put_preview_metadata(self, mock_controller):
-        """PUT the preview metadata endpoint."""
-        response = self.client.put('/12345/asdf1234==',
-                                   headers={'Authorization': self.token})
-        self.assertEqual(response.status_code, status.METHOD_NOT_ALLOWED,
-                         'PUT method is 405 Method Not Allowed')
-
-    @mock.patch(f'{routes.__name__}.controllers.get_preview_metadata')
-    def test_delete_preview_metadata(self, mock_controller):
-        """DELETE the preview metadata endpoint."""
-        response = self.client.delete('/12345/asdf1234==',
-                                      headers={'Authorization': self.token})
-        self.assertEqual(response.status_code, status.METHOD_NOT_ALLOWED,
-                         'DELETE method is 405 Method Not Allowed')
+    def test_disallowed_methods(self):
+        """Only HEAD and GET are allowed on the metadata endpoint."""
+        self.assertMethodsNotAllowed(METADATA_URL,
+                                     ['POST', 'PUT', 'DELETE'])
 
 
 class TestPreviewContent(APITest):
     """The content endpoint returns the content of the preview."""
 
-    @mock.patch(f'{routes.__name__}.controllers.get_preview_content')
-    def test_get_preview_content(self, mock_controller):
+    patched_controllers = ('get_preview_content', 'deposit_preview')
+
+    def test_get_preview_content(self):
         """GET the preview content endpoint."""
-        fake_content = b'fakecontent'
-        headers = {'Content-type': 'application/pdf', 'ETag': 'foobar1=='}
+        mock_controller = self.mock_controllers['get_preview_content']
+        headers = PDF_HEADERS
         mock_controller.return_value = (
-            io.BytesIO(fake_content),
+            io.BytesIO(FAKE_CONTENT),
             status.OK,
             headers
         )
-        response = self.client.get('/12345/asdf1234==/content',
+        response = self.client.get(CONTENT_URL,
                                    headers={'If-None-Match': 'foomatch',
                                             'Authorization': self.token})
 
-        mock_controller.assert_called_with('12345', 'asdf1234==', 'foomatch')
+        mock_controller.assert_called_with(SOURCE_ID, CHECKSUM, 'foomatch')
         self.assertEqual(response.status_code, status.OK,
                          'Returns with status code set by controller')
         self.assertEqual(response.headers['Content-type'],
                          headers['Content-type'],
                          'Content-type header indicates value returned'
                          ' by controller')
-        data = response.data
-        self.assertEqual(data, fake_content)
+        self.assertTrue(response.is_streamed, 'Content is streamed')
+        data = b''.join(response.iter_encoded())
+        self.assertEqual(data, FAKE_CONTENT)
         self.assertEqual(response.headers['ETag'], 'foobar1==',
                          'Returns ETag header given by controller')
+        self.assertEqual(response.headers['Cache-Control'], 'no-cache',
+                         'Caches must revalidate the content')
+
+    def test_get_preview_content_none_match(self):
+        """GET the preview content endpoint with a matching If-None-Match."""
+        mock_controller = self.mock_controllers['get_preview_content']
+        mock_controller.return_value = (
+            None,
+            status.NOT_MODIFIED,
+            {'ETag': 'foobar1=='}
+        )
+        response = self.client.get(CONTENT_URL,
+                                   headers={'If-None-Match': 'foobar1==',
+                                            'Authorization': self.token})
 
-    @mock.patch(f'{routes.__name__}.controllers.get_preview_content')
-    def test_post_preview_content(self, mock_controller):
-        """POST the preview content endpoint."""
-        response = self.client.post('/12345/asdf1234==/content',
-                                    headers={'Authorization': self.token})
-        self.assertEqual(response.status_code, status.METHOD_NOT_ALLOWED,
-                         'POST method is 405 Method Not Allowed')
-
-    @mock.patch(f'{routes.__name__}.controllers.get_preview_content')
-    def test_delete_preview_metadata(self, mock_controller):
-        """DELETE the preview content endpoint."""
-        response = self.client.delete('/12345/asdf1234==/content',
-                                      headers={'Authorization': self.token})
-        self.assertEqual(response.status_code, status.METHOD_NOT_ALLOWED,
-                         'DELETE method is 405 Method Not Allowed')
-
-    @mock.patch(f'{routes.__name__}.controllers.deposit_preview')
-    def test_put_preview_content_simple(self, mock_controller):
+        mock_controller.assert_called_with(SOURCE_ID, CHECKSUM, 'foobar1==')
+        self.assertEqual(response.status_code, status.NOT_MODIFIED,
+                         'Returns 304 Not Modified')
+        self.assertEqual(response.data, b'', 'Content is not sent')
+        self.assertEqual(response.headers['ETag'], 'foobar1==',
+                         'Returns ETag header given by controller')
+        self.assertEqual(response.headers['Cache-Control'], 'no-cache',
+                         'Caches must revalidate the content')
+
+    def test_get_preview_content_not_modified_since(self):
+        """GET the preview content endpoint with If-Modified-Since."""
+        mock_controller = self.mock_controllers['get_preview_content']
+        headers = {**PDF_HEADERS,
+                   'Last-Modified': 'Tue, 03 Mar 2020 12:00:00 GMT'}
+        mock_controller.return_value = (
+            io.BytesIO(FAKE_CONTENT),
+            status.OK,
+            headers
+        )
+        response = self.client.get(
+            CONTENT_URL,
+            headers={'If-Modified-Since': 'Wed, 04 Mar 2020 12:00:00 GMT',
+                     'Authorization': self.token}
+        )
+        self.assertEqual(response.status_code, status.NOT_MODIFIED,
+                         'Returns 304 Not Modified')
+        self.assertEqual(response.data, b'', 'Content is not sent')
+        self.assertEqual(response.headers['ETag'], 'foobar1==',
+                         'Returns ETag header given by controller')
+        self.assertEqual(response.headers['Cache-Control'], 'no-cache',
+                         'Caches must revalidate the content')
+
+    def test_get_preview_content_if_match(self):
+        """GET the preview content endpoint with If-Match."""
+        mock_controller = self.mock_controllers['get_preview_content']
+        for if_match in ['foomatch', '*']:
+            with self.subTest(if_match=if_match):
+                mock_controller.return_value = (
+                    io.BytesIO(FAKE_CONTENT),
+                    status.OK,
+                    PDF_HEADERS
+                )
+                response = self.client.get(
+                    CONTENT_URL,
+                    headers={'If-Match': if_match,
+                             'Authorization': self.token}
+                )
+                self.assertEqual(response.status_code, status.OK,
+                                 'If-Match is not evaluated')
+                self.assertEqual(response.data, FAKE_CONTENT)
+
+    def test_put_preview_content_simple(self):
         """PUT the preview content endpoint."""
+        mock_controller = self.mock_controllers['deposit_preview']
         mock_controller.return_value = (
             {'foo': 'bar'},
             status.CREATED,
             {'ETag': 'foobar1=='}
         )
-        response = self.client.put('/12345/asdf1234==/content',
-                                   data=b'fakecontent',
+        response = self.client.put(CONTENT_URL,
+                                   data=FAKE_CONTENT,
                                    headers={'Content-type': 'application/pdf',
                                             'Authorization': self.token})
         self.assertEqual(response.status_code, status.CREATED,
@@ -180,26 +239,43 @@ class TestPreviewContent(APITest):
                          'application/json',
                          'Return indicates JSON content type')
 
-    @mock.patch(f'{routes.__name__}.controllers.deposit_preview')
-    def test_put_preview_content(self, mock_controller):
+    def test_put_preview_content_unsupported_type(self):
+        """PUT the preview content endpoint with a non-PDF content type."""
+        mock_controller = self.mock_controllers['deposit_preview']
+        for content_type in ['text/plain', 'application/json',
+                             'multipart/form-data; boundary=foo']:
+            with self.subTest(content_type=content_type):
+                response = self.client.put(
+                    CONTENT_URL,
+                    data=FAKE_CONTENT,
+                    headers={'Content-type': content_type,
+                             'Authorization': self.token}
+                )
+                self.assertEqual(response.status_code, status.BAD_REQUEST,
+                                 'Returns 400 Bad Request')
+        self.assertFalse(mock_controller.called,
+                         'Request is rejected before reaching the controller')
+
+    def test_put_preview_content(self):
         """PUT the preview content endpoint."""
+        mock_controller = self.mock_controllers['deposit_preview']
         mock_controller.return_value = (
             {'foo': 'bar'},
             status.CREATED,
             {'ETag': 'foobar1=='}
         )
 
-        fake_content = io.BytesIO(b'fakecontent')
-        response = self.client.put('/12345/asdf1234==/content',
+        fake_content = io.BytesIO(FAKE_CONTENT)
+        response = self.client.put(CONTENT_URL,
                                    data=fake_content,
                                    headers={'Authorization': self.token})
 
         args, kwargs = mock_controller.call_args
         source_id, checksum, stream = args
 
-        self.assertEqual(source_id, '12345')
-        self.assertEqual(checksum, 'asdf1234==')
-        self.assertEqual(stream.read(), b'fakecontent')
+        self.assertEqual(source_id, SOURCE_ID)
+        self.assertEqual(checksum, CHECKSUM)
+        self.assertEqual(stream.read(), FAKE_CONTENT)
         self.assertFalse(kwargs['overwrite'])
         self.assertIsNone(kwargs['content_checksum'])
 
@@ -213,18 +289,37 @@ class TestPreviewContent(APITest):
         self.assertEqual(response.headers['ETag'], 'foobar1==',
                          'Returns ETag header given by controller')
 
-    @mock.patch(f'{routes.__name__}.controllers.deposit_preview')
-    def test_put_preview_content_with_validation(self, mock_controller):
+    def test_put_preview_content_overwrite(self):
+        """PUT the preview content endpoint with the Overwrite header."""
+        mock_controller = self.mock_controllers['deposit_preview']
+        mock_controller.return_value = (
+            {'foo': 'bar'},
+            status.CREATED,
+            {'ETag': 'foobar1=='}
+        )
+        for value, expected in [('true', True), ('True', True), ('1', True),
+                                ('false', False), ('no', False)]:
+            with self.subTest(overwrite=value):
+                self.client.put(CONTENT_URL,
+                                data=io.BytesIO(FAKE_CONTENT),
+                                headers={'Overwrite': value,
+                                         'Authorization': self.token})
+                _, kwargs = mock_controller.call_args
+                self.assertEqual(kwargs['overwrite'], expected,
+                                 f'Overwrite: {value} is parsed as {expected}')
+
+    def test_put_preview_content_with_validation(self):
         """PUT the preview content endpoint with checksum validation."""
+        mock_controller = self.mock_controllers['deposit_preview']
         mock_controller.return_value = (
             {'foo': 'bar'},
             status.CREATED,
             {'ETag': 'foobar1=='}
         )
 
-        fake_content = io.BytesIO(b'fakecontent')
+        fake_content = io.BytesIO(FAKE_CONTENT)
         response = self.client.put(
-            '/12345/asdf1234==/content',
+            CONTENT_URL,
             data=fake_content,
             headers={'ETag': 'footag==', 'Authorization': self.token}
         )
@@ -232,9 +327,9 @@ class TestPreviewContent(APITest):
         args, kwargs = mock_controller.call_args
         source_id, checksum, stream = args
 
-        self.assertEqual(source_id, '12345')
-        self.assertEqual(checksum, 'asdf1234==')
-        self.assertEqual(stream.read(), b'fakecontent')
+        self.assertEqual(source_id, SOURCE_ID)
+        self.assertEqual(checksum, CHECKSUM)
+        self.assertEqual(stream.read(), FAKE_CONTENT)
         self.assertFalse(kwargs['overwrite'])
         self.assertEqual(kwargs['content_checksum'], 'footag==')
 
@@ -246,4 +341,9 @@ class TestPreviewContent(APITest):
         data = response.get_json()
         self.assertIsNotNone(data, 'Returns JSON content')
         self.assertEqual(response.headers['ETag'], 'foobar1==',
-                         'Returns ETag header given by controller')
\ No newline at end of file
+                         'Returns ETag header given by controller')
+
+    def test_disallowed_methods(self):
+        """Only GET and PUT are allowed on the content endpoint."""
+        self.assertMethodsNotAllowed(CONTENT_URL,
+                                     ['POST', 'DELETE'])
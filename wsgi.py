@@ -1,6 +1,7 @@
 """Web Server Gateway Interface entry-point."""
 
 import os
+import threading
 from typing import Optional
 
 from flask import Flask
@@ -8,16 +9,38 @@ from flask import Flask
 from preview.factory import create_app
 
 __flask_app__: Optional[Flask] = None
+_init_lock = threading.Lock()
 
 
 def application(environ, start_response):
     """WSGI application factory."""
-    global __flask_app__
+    global __flask_app__, application
+    app = __flask_app__
+    if app is None:
+        # Threaded servers may receive several first requests at once; make
+        # sure that only one of them creates the app.
+        with _init_lock:
+            if __flask_app__ is None:
+                _prime_os_environ(environ)
+                __flask_app__ = create_app()
+                # Servers that look up the callable again go straight to the
+                # app from now on.
+                application = __flask_app__
+            app = __flask_app__
+    return app(environ, start_response)
+
+
+def _prime_os_environ(environ):
+    """
+    Copy configuration from the WSGI environ into ``os.environ``.
+
+    The server passes the same configuration in the environ of every request,
+    so this only needs to happen once, before the app is created; the app
+    reads its configuration from ``os.environ`` at that point. Request headers
+    (``HTTP_*``) are client-supplied and are not configuration, so they are
+    skipped.
+    """
     for key, value in environ.items():
-        if type(value) is str and key != 'SERVER_NAME':
+        if type(value) is str and key != 'SERVER_NAME' \
+                and not key.startswith('HTTP_'):
             os.environ[key] = value
-            if __flask_app__ is not None and key in __flask_app__.config:
-                __flask_app__.config[key] = value
-    if __flask_app__ is None:
-        __flask_app__ = create_app()
-    return __flask_app__(environ, start_response)